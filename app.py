@@ -1,33 +1,48 @@
 import uvicorn
 import asyncio
 import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterable, List, Optional
+
+# FastAPI >= 0.135 ships native SSE support, which encodes the Pydantic
+# payloads in pydantic-core and sends keep-alive pings on its own.
+try:
+    from fastapi.sse import EventSourceResponse, ServerSentEvent
+except ImportError:
+    EventSourceResponse = None
+    ServerSentEvent = None
 
 # Import the RAG components directly
 try:
-    from src.pipeline import run_rag, load_config
+    from src.pipeline import run_rag, load_config, answer_cache
     from src.retriever import retrieve_documents
-    from src.re_ranker import rerank_chunks
-    from src.generator import generate_answer
+    from src.re_ranker import rerank_chunks, warm_up
+    from src.generator import generate_answer, preload_generator
 except ImportError:
     print("Could not import from 'src', trying relative import...")
     try:
-        from pipeline import run_rag, load_config
+        from pipeline import run_rag, load_config, answer_cache
         from retriever import retrieve_documents
-        from re_ranker import rerank_chunks
-        from generator import generate_answer
+        from re_ranker import rerank_chunks, warm_up
+        from generator import generate_answer, preload_generator
     except ImportError:
         print("Fatal: Could not find 'pipeline.py', 'retriever.py', 're_ranker.py' or 'generator.py'.")
         exit(1)
 
-
 # --- Configuration ---
 CONFIG_PATH = "config.yaml"
 
+# Size of the thread pool used for the blocking RAG stages (retrieval,
+# re-ranking, generation). This is per worker process: running 4 gunicorn
+# workers with THREAD_POOL_SIZE=16 allows up to 64 concurrent stages overall.
+THREAD_POOL_SIZE = int(os.environ.get("THREAD_POOL_SIZE", 32))
+
 # --- Pydantic Models ---
 class HealthResponse(BaseModel): status: str = "ok"
 class RunRequest(BaseModel): question: str
@@ -42,9 +57,23 @@ class StreamResponse(BaseModel):
     error: Optional[str] = None
 
 # --- FastAPI App ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Installs a sized default executor, used by every asyncio.to_thread call,
+    and warms up the embedding model before the first request arrives.
+    """
+    executor = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="rag")
+    asyncio.get_running_loop().set_default_executor(executor)
+    print(f"Default executor set to {THREAD_POOL_SIZE} threads.")
+    await asyncio.to_thread(warm_up)
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+
 app = FastAPI(
     title="RAG System API",
-    description="API for the MMU-RAGent competition-compliant RAG system."
+    description="API for the MMU-RAGent competition-compliant RAG system.",
+    lifespan=lifespan
 )
 
 # --- Endpoint 1: /health ---
@@ -55,23 +84,23 @@ async def get_health():
 # --- Endpoint 2: /run (Dynamic Evaluation) ---
 async def stream_rag_response(question: str):
     """
-    A generator function that yields Server-Sent Events (SSE)
+    A generator function that yields the StreamResponse payloads
     for the /run endpoint, with detailed intermediate steps.
+    Encoding them as Server-Sent Events (SSE) is left to run_endpoint.
     """
-    loop = asyncio.get_event_loop()
     contexts = []
     
     try:
         # Step 1: Send "thinking" status
-        yield "data: " + StreamResponse(
+        yield StreamResponse(
             intermediate_steps="Query received. Initializing RAG pipeline...",
             final_report=None,
             is_intermediate=True,
             complete=False
-        ).model_dump_json() + "\n\n"
+        )
         
         # Step 2: Load configuration
-        config = await loop.run_in_executor(None, load_config, CONFIG_PATH)
+        config = await asyncio.to_thread(load_config, CONFIG_PATH)
         
         api_key = os.environ.get("FINEWEB_API_KEY", config.get('fineweb_api_key'))
         retriever_top_k = config.get('retriever_top_k', 5)
@@ -83,29 +112,41 @@ async def stream_rag_response(question: str):
         if not api_key or not generator_model:
             raise ValueError("Config is missing 'fineweb_api_key' or 'generator_model'")
 
-        yield "data: " + StreamResponse(
+        # Serve near-duplicate queries straight from the semantic cache
+        query_embedding = await asyncio.to_thread(answer_cache.embed, question)
+        cached = answer_cache.lookup(query_embedding)
+        if cached:
+            final_response = StreamResponse(
+                intermediate_steps="Found a cached answer for a near-identical question.",
+                final_report=cached["answer"],
+                is_intermediate=False,
+                citations=cached["citations"],
+                complete=False
+            )
+            yield final_response
+            yield final_response.model_copy(update={"complete": True})
+            return
+
+        yield StreamResponse(
             intermediate_steps="Stage 1: Configuration loaded. Retrieving documents from FineWeb API...",
             final_report=None,
             is_intermediate=True,
             complete=False
-        ).model_dump_json() + "\n\n"
+        )
 
-        # Step 3: Run Stage 1 Retrieval (in a thread)
-        documents_with_urls = await loop.run_in_executor(
-            None,  # Use default ThreadPoolExecutor
-            retrieve_documents,
-            question,
-            api_key,
-            retriever_top_k
+        # Step 3: Run Stage 1 Retrieval (in a thread), while the generator model loads
+        documents_with_urls, _ = await asyncio.gather(
+            asyncio.to_thread(retrieve_documents, question, api_key, retriever_top_k),
+            asyncio.to_thread(preload_generator, generator_model)
         )
         
         if not documents_with_urls:
-            yield "data: " + StreamResponse(
+            yield StreamResponse(
                 intermediate_steps="Stage 1: No documents found on FineWeb for this query.",
                 final_report="I could not find any relevant information to answer your question.",
                 is_intermediate=False,
                 complete=True
-            ).model_dump_json() + "\n\n"
+            )
             return
 
         document_texts = [doc for doc, url in documents_with_urls]
@@ -113,17 +154,16 @@ async def stream_rag_response(question: str):
 
         # Step 4: Send "processing" status
         intermediate_message = f"Stage 1: Retrieved {len(document_texts)} documents.|||---|||Stage 2: Processing and re-ranking chunks..."
-        yield "data: " + StreamResponse(
+        yield StreamResponse(
             intermediate_steps=intermediate_message,
             final_report=None,
             is_intermediate=True,
             complete=False,
             citations=citations # Show citations early
-        ).model_dump_json() + "\n\n"
+        )
 
         # Step 5: Run Stage 2 Re-ranking (in a thread)
-        final_contexts = await loop.run_in_executor(
-            None,
+        final_contexts = await asyncio.to_thread(
             rerank_chunks,
             question,
             document_texts,
@@ -133,83 +173,86 @@ async def stream_rag_response(question: str):
         )
         
         if not final_contexts:
-            yield "data: " + StreamResponse(
+            yield StreamResponse(
                 intermediate_steps="Stage 2: No relevant chunks found after re-ranking.",
                 final_report="I found documents, but no specific information to answer your question.",
                 is_intermediate=False,
                 complete=True,
                 citations=citations
-            ).model_dump_json() + "\n\n"
+            )
             return
 
         # Step 6: Send "generating" status
         intermediate_message = f"Stage 2: Found {len(final_contexts)} relevant chunks.|||---|||Stage 3: Generating final answer..."
-        yield "data: " + StreamResponse(
+        yield StreamResponse(
             intermediate_steps=intermediate_message,
             final_report=None,
             is_intermediate=True,
             complete=False,
             citations=citations
-        ).model_dump_json() + "\n\n"
+        )
         
         # Step 7: Run Stage 3 Generation (in a thread)
-        answer = await loop.run_in_executor(
-            None,
+        answer = await asyncio.to_thread(
             generate_answer,
             question,
             final_contexts,
             generator_model
         )
 
+        # Don't cache the error message returned when generation fails
+        if not answer.startswith("Error:"):
+            answer_cache.insert(query_embedding, answer, citations)
+
         # Step 8: Send the final answer
-        yield "data: " + StreamResponse(
+        final_response = StreamResponse(
             intermediate_steps=intermediate_message, # Keep last step
             final_report=answer,
             is_intermediate=False,
             citations=citations,
             complete=False # Not complete until the next message
-        ).model_dump_json() + "\n\n"
+        )
+        yield final_response
         
         # Step 9: Send the completion signal
-        yield "data: " + StreamResponse(
-            intermediate_steps=intermediate_message,
-            final_report=answer,
-            is_intermediate=False,
-            citations=citations,
-            complete=True
-        ).model_dump_json() + "\n\n"
+        # Only the flag differs, so copy the payload instead of re-validating it
+        yield final_response.model_copy(update={"complete": True})
 
     except Exception as e:
         print(f"Error in /run stream: {e}")
         error_message = f"An error occurred: {e}"
-        yield "data: " + StreamResponse(
+        yield StreamResponse(
             error=error_message,
             is_intermediate=False,
             complete=True
-        ).model_dump_json() + "\n\n"
+        )
 
-@app.post("/run")
-async def run_endpoint(request: RunRequest):
-    return StreamingResponse(
-        stream_rag_response(request.question),
-        media_type="text/event-stream"
-    )
+if EventSourceResponse is not None:
+    @app.post("/run", response_class=EventSourceResponse)
+    async def run_endpoint(request: RunRequest) -> AsyncIterable[ServerSentEvent]:
+        async for event in stream_rag_response(request.question):
+            yield ServerSentEvent(data=event)
+else:
+    async def _encode_sse(question: str):
+        async for event in stream_rag_response(question):
+            yield "data: " + event.model_dump_json() + "\n\n"
+
+    @app.post("/run")
+    async def run_endpoint(request: RunRequest):
+        return StreamingResponse(
+            _encode_sse(request.question),
+            media_type="text/event-stream"
+        )
 
 # --- Endpoint 3: /evaluate (Static Evaluation) ---
 @app.post("/evaluate", response_model=EvaluateResponse)
 async def evaluate_endpoint(request: EvaluateRequest):
     """
     Handles static evaluation.
-    This calls the all-in-one 'run_rag' function.
+    This awaits the all-in-one 'run_rag' coroutine.
     """
     try:
-        loop = asyncio.get_event_loop()
-        answer = await loop.run_in_executor(
-            None,
-            run_rag,
-            request.query,
-            CONFIG_PATH
-        )
+        answer = await run_rag(request.query, CONFIG_PATH)
         
         response_data = EvaluateResponse(
             query_id=request.iid,
@@ -233,10 +276,14 @@ async def evaluate_endpoint(request: EvaluateRequest):
 
 # --- Main execution ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
     if os.path.exists("result.jsonl"):
         os.remove("result.jsonl")
         print("Removed old 'result.jsonl' file.")
 
     print(f"Starting RAG server at http://localhost:5010")
     print("Ensure 'config.yaml' is present.")
-    uvicorn.run(app, host="0.0.0.0", port=5010)
\ No newline at end of file
+    # "auto" picks uvloop and httptools (from uvicorn[standard]) when they are
+    # installed, and falls back to asyncio and h11 when they are not.
+    uvicorn.run(app, host="0.0.0.0", port=5010, loop="auto", http="auto")
@@ -11,6 +11,16 @@ except ImportError:
     print("Please install it with: pip install ftfy")
     ftfy = None
 
+# --- Compiled patterns ---
+# Compiled once at import time instead of being looked up on every call
+_RE_HTML = re.compile(r'<[^>]+>')
+_RE_MD_LINK = re.compile(r'\[.*?\]\(.*?\)')
+_RE_MD_MARK = re.compile(r'[\*\_`]')
+_RE_HEADER = re.compile(r'^\s*#+\s+', re.MULTILINE)
+# \s already covers newlines, tabs and carriage returns. Single spaces are
+# left alone, so ordinary prose does not get every space rewritten.
+_RE_WS = re.compile(r'\s{2,}|[^\S ]')
+
 def clean_text(text: str) -> str:
     """
     Clean and preprocess raw text for better RAG performance.
@@ -28,25 +38,31 @@ def clean_text(text: str) -> str:
     if ftfy:
         text = ftfy.fix_text(text)
 
+    # Each pass below copies the whole string, so passes that cannot match
+    # are skipped with a cheap substring check. Most FineWeb documents are
+    # plain text and skip the HTML, link and header passes entirely.
+
     # 2. Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', text)
+    if '<' in text:
+        text = _RE_HTML.sub(' ', text)
 
     # 3. Remove Markdown:
     # Remove links [text](url)
-    text = re.sub(r'\[.*?\]\(.*?\)', ' ', text)
+    if '](' in text:
+        text = _RE_MD_LINK.sub(' ', text)
     # Remove bold, italics, code (`*`, `_`, '`')
-    text = re.sub(r'([\*\_`])', ' ', text)
+    text = _RE_MD_MARK.sub(' ', text)
     # Remove headers
-    text = re.sub(r'^\s*#+\s+', '', text, flags=re.MULTILINE)
+    if '#' in text:
+        text = _RE_HEADER.sub('', text)
 
     # 4. Convert to lowercase
     text = text.lower()
 
     # 5. Normalize whitespace:
-    # Replace newlines, tabs, and carriage returns with a single space
-    text = re.sub(r'[\n\t\r]', ' ', text)
-    # Collapse multiple whitespace characters into a single space
-    text = re.sub(r'\s+', ' ', text)
+    # Collapse runs of whitespace (incl. newlines, tabs and carriage
+    # returns) into a single space
+    text = _RE_WS.sub(' ', text)
 
     # 6. Remove leading/trailing whitespace
     text = text.strip()
@@ -0,0 +1,31 @@
+from functools import lru_cache
+
+# --- Function ---
+
+@lru_cache(maxsize=1)
+def pick_device() -> str:
+    """
+    Pick the torch device to run models on.
+
+    torch is imported here rather than at module level, so importing
+    this module does not pay the torch start-up cost.
+
+    Returns:
+        "cuda" if a CUDA GPU is available, "mps" on Apple Silicon,
+        otherwise "cpu"
+    """
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+# --- Example Usage (for testing) ---
+if __name__ == "__main__":
+    print(f"Selected device: {pick_device()}")
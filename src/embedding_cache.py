@@ -0,0 +1,126 @@
+import os
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+# --- Configuration ---
+# Upper bound on the number of embeddings kept in memory (and on disk).
+# MiniLM vectors are 384 float32s, so 100k entries is roughly 150MB.
+MAX_ENTRIES = 100_000
+
+# --- Class ---
+
+class CachedEncoder:
+    """
+    Wraps a SentenceTransformer so that each distinct text is only encoded once.
+
+    Embeddings are keyed by sha256(model_name + "\\0" + text) and kept in an
+    in-memory LRU. If a cache_path is given, the cache is loaded from and
+    saved to an .npz file so re-indexing an unchanged corpus is free.
+    """
+
+    def __init__(self, model, model_name: str, cache_path: Optional[str] = None, max_entries: int = MAX_ENTRIES):
+        self.model = model
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
+        if cache_path and os.path.exists(cache_path):
+            self.load()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256((self.model_name + "\0" + text).encode("utf-8")).digest()
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 64,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Encode texts, only running the model on texts not already cached.
+
+        Args:
+            texts: List of texts to embed
+            batch_size: Batch size passed to the model for the cache misses
+            normalize_embeddings: Whether the model should L2-normalize new embeddings
+            show_progress_bar: Whether the model should show a progress bar
+
+        Returns:
+            A float32 array of shape (len(texts), d), in the order of texts
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        keys = [self._key(text) for text in texts]
+
+        # 1. Look up everything that is already cached
+        vectors = [self._cache.get(key) for key in keys]
+
+        # 2. Encode the misses (each distinct text only once)
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+
+        new_vectors = {}
+        if missing:
+            hits = sum(vector is not None for vector in vectors)
+            print(f"Embedding cache: {hits} hits, encoding {len(missing)} new texts...")
+            encoded = self.model.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                normalize_embeddings=normalize_embeddings,
+                show_progress_bar=show_progress_bar,
+                convert_to_numpy=True
+            )
+            new_vectors = dict(zip(missing.keys(), encoded.astype(np.float32)))
+
+        # 3. Scatter cached and new vectors into the output matrix
+        d = len(vectors[0]) if vectors[0] is not None else len(new_vectors[keys[0]])
+        embeddings = np.empty((len(texts), d), dtype=np.float32)
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            embeddings[i] = vector if vector is not None else new_vectors[key]
+
+        # 4. Mark hits as recently used and upsert the new entries
+        for key in keys:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+        for key, vector in new_vectors.items():
+            self._cache[key] = vector
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return embeddings
+
+    def load(self):
+        """Loads cached embeddings from cache_path."""
+        try:
+            with np.load(self.cache_path) as data:
+                for key, vector in zip(data["keys"], data["vectors"]):
+                    self._cache[key.tobytes()] = vector
+            print(f"Loaded {len(self._cache)} cached embeddings from: {self.cache_path}")
+        except Exception as e:
+            print(f"Warning: Could not load embedding cache {self.cache_path}: {e}")
+
+    def save(self):
+        """Saves the cached embeddings to cache_path, if one was given."""
+        if not self.cache_path or not self._cache:
+            return
+
+        keys = np.frombuffer(b"".join(self._cache.keys()), dtype=np.uint8).reshape(-1, 32)
+        vectors = np.stack(list(self._cache.values()))
+
+        # Write to a temporary file first so a crash never leaves a corrupt cache
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, keys=keys, vectors=vectors)
+            os.replace(tmp_path, self.cache_path)
+            print(f"Saved {len(self._cache)} cached embeddings to: {self.cache_path}")
+        except Exception as e:
+            print(f"Warning: Could not save embedding cache {self.cache_path}: {e}")
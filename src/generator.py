@@ -1,20 +1,34 @@
-from typing import List, Dict
+import threading
+from typing import List, Dict, Tuple
 
 # This script requires 'transformers' and 'torch'
 # pip install transformers torch
 try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 except ImportError:
     print("Warning: 'transformers' or 'torch' not found.")
     print("Please install with: pip install transformers torch")
-    pipeline = None
+    torch = None
     AutoTokenizer = None
     AutoModelForSeq2SeqLM = None
 
+try:
+    from .device import pick_device
+except ImportError:
+    from device import pick_device
+
+# --- Configuration ---
+# Maximum number of context tokens put in the prompt. This leaves room for
+# the instructions and the question within the model's 512-token input.
+CONTEXT_TOKEN_BUDGET = 400
+
 # --- Caching ---
-# We cache the loaded models/pipelines in memory to avoid reloading
+# We cache the loaded tokenizers/models in memory to avoid reloading
 # on every API request. The key will be the model_name.
-generator_cache: Dict[str, "pipeline"] = {}
+generator_cache: Dict[str, Tuple["AutoTokenizer", "AutoModelForSeq2SeqLM"]] = {}
+# Serializes loading, so concurrent requests don't load the same model twice
+_generator_cache_lock = threading.Lock()
 
 # --- Function ---
 
@@ -41,16 +55,69 @@ def _build_prompt(query: str, contexts: List[str]) -> str:
     """
     return prompt
 
+def _pick_dtype(device: str) -> "torch.dtype":
+    """
+    Half precision on GPU, full precision on CPU.
+
+    T5-family models can overflow in fp16, so bf16 is preferred
+    where the GPU supports it.
+    """
+    if device != "cuda":
+        return torch.float32
+    if torch.cuda.is_bf16_supported():
+        return torch.bfloat16
+    return torch.float16
+
+def load_generator(model_name: str) -> Tuple["AutoTokenizer", "AutoModelForSeq2SeqLM"]:
+    """
+    Returns the (tokenizer, model) pair for model_name, loading it on first use.
+    """
+    if model_name in generator_cache:
+        return generator_cache[model_name]
+
+    with _generator_cache_lock:
+        # Another thread may have loaded it while we waited for the lock
+        if model_name in generator_cache:
+            return generator_cache[model_name]
+
+        if not AutoModelForSeq2SeqLM:
+            raise ImportError("'transformers' or 'torch' is not installed.")
+        device = pick_device()
+        dtype = _pick_dtype(device)
+        print(f"Loading model: {model_name} (device: {device}, dtype: {dtype})")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, torch_dtype=dtype)
+        model.to(device)
+        model.eval()
+
+        generator_cache[model_name] = (tokenizer, model)
+        return tokenizer, model
+
+def preload_generator(model_name: str) -> None:
+    """
+    Loads model_name into the cache ahead of generation, e.g. while
+    retrieval is still running. Errors are reported by generate_answer.
+    """
+    try:
+        load_generator(model_name)
+    except Exception as e:
+        print(f"Warning: Could not preload model {model_name}: {e}")
+
 def generate_answer(question, contexts, model_name="google/flan-t5-base"):
     try:
-        print(f"Loading model: {model_name}")
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        tokenizer, model = load_generator(model_name)
 
-        # Combine and trim context (prevent token overflow)
+        # Combine and trim context to the token budget (prevent token overflow).
+        # The fast tokenizer truncates in Rust; we only decode when it had to cut.
         context_text = " ".join(contexts)
-        if len(context_text.split()) > 400:
-            context_text = " ".join(context_text.split()[:400])
+        context_ids = tokenizer(
+            context_text,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=CONTEXT_TOKEN_BUDGET
+        )["input_ids"]
+        if len(context_ids) >= CONTEXT_TOKEN_BUDGET:
+            context_text = tokenizer.decode(context_ids, skip_special_tokens=True)
 
         prompt = f"""You are an expert AI assistant.
 Use the following context to answer the question clearly and concisely.
@@ -64,16 +131,20 @@ Question:
 Answer in 3–5 sentences:"""
 
         # Tokenize
-        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=512)
-
-        # Generate with sampling for richer output
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=256,
-            do_sample=True,
-            top_p=0.9,
-            temperature=0.8
-        )
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=512).to(model.device)
+
+        # Generate with sampling for richer output.
+        # inference_mode skips all autograd bookkeeping.
+        with torch.inference_mode():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=256,
+                do_sample=True,
+                top_p=0.9,
+                temperature=0.8,
+                num_beams=1,
+                use_cache=True
+            )
 
         answer = tokenizer.decode(outputs[0], skip_special_tokens=True)
         print("Generated answer:", answer)
@@ -84,7 +155,7 @@ Answer in 3–5 sentences:"""
         return f"Error: Could not load model {model_name}." 
 # --- Example Usage (for testing) ---
 if __name__ == "__main__":
-    if pipeline:
+    if AutoModelForSeq2SeqLM:
         # Use a small, fast model for testing
         test_model = "google/flan-t5-small"
         
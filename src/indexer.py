@@ -1,7 +1,11 @@
 import os
 import json
+import math
+from functools import lru_cache
 from typing import List
 
+import numpy as np
+
 # This script requires FAISS and sentence-transformers:
 # pip install faiss-gpu sentence-transformers
 # (or pip install faiss-gpu if you have a CUDA-enabled GPU)
@@ -14,39 +18,75 @@ except ImportError:
     faiss = None
     SentenceTransformer = None
 
+try:
+    from .device import pick_device
+    from .embedding_cache import CachedEncoder
+except ImportError:
+    from device import pick_device
+    from embedding_cache import CachedEncoder
+
 # --- Configuration ---
 
 # We MUST use the same model that was used in tokenizer.py
 # to ensure consistency between token counting and embedding.
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-# Initialize the model once
-if SentenceTransformer:
+# Corpora with at least this many chunks get an IVF index with 8-bit
+# scalar-quantized vectors instead of an exact one. Below it, training the
+# coarse quantizer costs more than the brute-force scan it saves.
+IVF_MIN_CHUNKS = 10_000
+# Number of inverted lists probed per query (of nlist = 4 * sqrt(N)).
+IVF_NPROBE = 8
+# FAISS k-means needs at least this many training points per centroid;
+# nlist is capped so small IVF corpora still get well-trained lists.
+IVF_MIN_POINTS_PER_LIST = 39
+
+# Chunks encoded per forward pass
+ENCODE_BATCH_SIZE = 128
+
+# --- Functions ---
+
+@lru_cache(maxsize=1)
+def _get_model():
+    """
+    Load the embedding model on first use.
+
+    Loading lazily keeps importing this module cheap for code paths
+    that never build an index.
+    """
+    if not SentenceTransformer:
+        return None
+
     try:
-        model = SentenceTransformer(MODEL_NAME)
-        print(f"Successfully loaded embedding model: {MODEL_NAME}")
+        device = pick_device()
+        model = SentenceTransformer(MODEL_NAME, device=device)
+        # Half precision halves memory traffic and uses tensor cores on GPU.
+        # It is slower than fp32 on CPU, so only enable it for CUDA.
+        if device == "cuda":
+            model.half()
+        print(f"Successfully loaded embedding model: {MODEL_NAME} (device: {device})")
+        return model
     except Exception as e:
         print(f"Error loading embedding model {MODEL_NAME}: {e}")
-        model = None
-else:
-    model = None
-
-# --- Function ---
+        return None
 
 def build_index(chunks: List[str], index_path: str):
     """
     Build and save a FAISS index from document chunks.
     
-    Saves two files:
+    Saves three files:
     1. index_path + ".faiss" (the vector index)
     2. index_path + ".chunks.json" (the mapping from ID to text)
+    3. index_path + ".embeddings.npz" (the embedding cache, so unchanged
+       chunks are not re-encoded the next time the index is built)
     
     Args:
         chunks: List of text chunks to index
         index_path: The *base path* where the index and chunk files
                     should be saved (e.g., "my_index")
     """
-    if not model or not faiss:
+    model = _get_model() if faiss else None
+    if not model:
         print("Error: Required libraries (FAISS, SentenceTransformers) not loaded.")
         return
 
@@ -56,18 +96,42 @@ def build_index(chunks: List[str], index_path: str):
 
     print(f"Generating embeddings for {len(chunks)} chunks...")
     
-    # 1. Generate embeddings for each chunk
+    # 1. Generate embeddings for each chunk, reusing cached ones
     # show_progress_bar=True is helpful for large datasets
-    embeddings = model.encode(chunks, show_progress_bar=True)
+    encoder = CachedEncoder(model, MODEL_NAME, cache_path=f"{index_path}.embeddings.npz")
+    embeddings = encoder.encode(
+        chunks,
+        batch_size=ENCODE_BATCH_SIZE,
+        normalize_embeddings=True,
+        show_progress_bar=True
+    )
+    
+    # FAISS needs a C-contiguous float32 matrix (the cache already casts fp16
+    # model outputs back to float32). Vectors from older caches may not be
+    # normalized, so we L2-normalize in place so that inner product equals
+    # cosine similarity.
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    faiss.normalize_L2(embeddings)
     
     # Get the dimensionality of the embeddings
     d = embeddings.shape[1]
     
     # 2. Create FAISS index
-    # We use IndexFlatL2 for exact, brute-force search.
-    # It's good for starters and smaller datasets.
-    # For larger datasets, one might use IndexIVFFlat.
-    index = faiss.IndexFlatL2(d)
+    # Small corpora use IndexFlatIP for exact, brute-force search.
+    # Larger ones use IndexIVFScalarQuantizer, which only scans the nprobe
+    # closest of nlist clusters per query and stores each vector as int8
+    # (4x less memory than float32, and SIMD int8 dot products at search).
+    if len(chunks) >= IVF_MIN_CHUNKS:
+        nlist = min(int(4 * math.sqrt(len(chunks))), len(chunks) // IVF_MIN_POINTS_PER_LIST)
+        print(f"Training IVF-SQ8 index with {nlist} lists...")
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+        index.nprobe = IVF_NPROBE
+    else:
+        index = faiss.IndexFlatIP(d)
     
     # 3. Add embeddings to the index
     print("Adding embeddings to FAISS index...")
@@ -88,6 +152,9 @@ def build_index(chunks: List[str], index_path: str):
         chunk_data = {i: chunk for i, chunk in enumerate(chunks)}
         with open(chunks_file, 'w', encoding='utf-8') as f:
             json.dump(chunk_data, f, indent=2, ensure_ascii=False)
+
+        # Persist the embedding cache for the next build
+        encoder.save()
             
         print("Indexing complete.")
 
@@ -96,7 +163,7 @@ def build_index(chunks: List[str], index_path: str):
 
 # --- Example Usage (for testing) ---
 if __name__ == "__main__":
-    if model and faiss:
+    if faiss and _get_model():
         test_chunks = [
             "Machine learning is a subfield of artificial intelligence.",
             "It focuses on the development of algorithms.",
@@ -112,15 +179,23 @@ if __name__ == "__main__":
         # Check if files were created
         faiss_created = os.path.exists(f"{test_index_path}.faiss")
         chunks_created = os.path.exists(f"{test_index_path}.chunks.json")
+        cache_created = os.path.exists(f"{test_index_path}.embeddings.npz")
         
         print(f"\nIndex file created: {faiss_created}")
         print(f"Chunks file created: {chunks_created}")
+        print(f"Embedding cache created: {cache_created}")
+
+        # Rebuilding the same index should be served from the cache
+        print(f"\n--- Rebuilding test index at '{test_index_path}' ---")
+        build_index(test_chunks, test_index_path)
         
         # Clean up
         if faiss_created:
             os.remove(f"{test_index_path}.faiss")
         if chunks_created:
             os.remove(f"{test_index_path}.chunks.json")
+        if cache_created:
+            os.remove(f"{test_index_path}.embeddings.npz")
             
         print("Cleanup complete.")
     else:
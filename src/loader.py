@@ -1,5 +1,7 @@
 import os
 import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Optional
 
 # To handle PDFs, you'll need to install pypdf:
@@ -11,6 +13,83 @@ except ImportError:
     print("Please install it with: pip install pypdf")
     PdfReader = None
 
+# orjson parses JSON several times faster than the standard library:
+# pip install orjson
+try:
+    import orjson
+except ImportError:
+    print("Warning: 'orjson' library not found. Falling back to the standard 'json' module.")
+    print("Please install it with: pip install orjson")
+    orjson = None
+
+# --- Configuration ---
+# PDFs with at least this many pages are extracted in parallel.
+# Below that, starting worker processes costs more than it saves.
+PDF_PARALLEL_MIN_PAGES = 32
+
+# Maximum number of files whose content is kept in file_cache
+FILE_CACHE_MAX_ENTRIES = 1024
+
+# --- File Cache ---
+# Maps file_path -> (st_mtime_ns, st_size, content), so repeated load_corpus
+# calls over the same corpus skip re-reading unchanged files.
+file_cache: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+
+def _json_loads(data: bytes):
+    """
+    Parses JSON from bytes, with orjson if available.
+
+    orjson is strict RFC 8259 and rejects input the json module accepts
+    (NaN/Infinity literals, UTF-16/32 encodings), so on an orjson error
+    we retry with the json module before giving up.
+    """
+    if orjson:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+def _json_dumps(data, indent: bool = False) -> str:
+    """Serializes data to a JSON string, with orjson if available."""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+    return json.dumps(data, indent=2 if indent else None)
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extracts the text of pages [start, stop) of a PDF. Runs in a worker process."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+def _load_pdf(file_path: str) -> str:
+    """
+    Extracts the text of all pages of a PDF.
+
+    pypdf's text extraction is pure Python and holds the GIL, so large PDFs
+    are split into contiguous page ranges and extracted in separate processes.
+    """
+    reader = PdfReader(file_path)
+    num_pages = len(reader.pages)
+    workers = min(os.cpu_count() or 1, num_pages // PDF_PARALLEL_MIN_PAGES)
+
+    if workers > 1:
+        step = -(-num_pages // workers)  # ceil division
+        starts = list(range(0, num_pages, step))
+        stops = [min(start + step, num_pages) for start in starts]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() returns the page ranges in order
+                results = executor.map(_extract_pdf_pages, [file_path] * len(starts), starts, stops)
+                text_parts = [text for part in results for text in part]
+            return "\n\n".join(text_parts)
+        except Exception as e:
+            print(f"Parallel extraction failed for {file_path}, falling back to serial: {e}")
+
+    text_parts = []
+    for page in reader.pages:
+        text_parts.append(page.extract_text())
+    return "\n\n".join(text_parts)
+
 def _load_file(file_path: str) -> Optional[str]:
     """Helper function to load content from a single file."""
     try:
@@ -25,15 +104,12 @@ def _load_file(file_path: str) -> Optional[str]:
                 print(f"Skipping PDF {file_path}, 'pypdf' is not installed.")
                 return None
             
-            reader = PdfReader(file_path)
-            text_parts = []
-            for page in reader.pages:
-                text_parts.append(page.extract_text())
-            return "\n\n".join(text_parts)
+            return _load_pdf(file_path)
 
         elif ext == '.json':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # Both parsers accept bytes, which skips a separate decode step
+            with open(file_path, 'rb') as f:
+                data = _json_loads(f.read())
                 # Try to find a 'text' or 'content' key,
                 # otherwise, just serialize the whole JSON object as text.
                 if isinstance(data, dict):
@@ -41,14 +117,14 @@ def _load_file(file_path: str) -> Optional[str]:
                         return str(data['text'])
                     if 'content' in data:
                         return str(data['content'])
-                return json.dumps(data, indent=2)
+                return _json_dumps(data, indent=True)
         
         elif ext == '.jsonl':
             text_parts = []
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open(file_path, 'rb') as f:
                 for line in f:
                     if line.strip():
-                        data = json.loads(line)
+                        data = _json_loads(line)
                         if isinstance(data, dict):
                             if 'text' in data:
                                 text_parts.append(str(data['text']))
@@ -56,7 +132,7 @@ def _load_file(file_path: str) -> Optional[str]:
                                 text_parts.append(str(data['content']))
                             else:
                                 # Fallback for unknown JSONL structure
-                                text_parts.append(json.dumps(data))
+                                text_parts.append(_json_dumps(data))
                         else:
                             text_parts.append(str(data))
             return "\n\n".join(text_parts)
@@ -69,9 +145,39 @@ def _load_file(file_path: str) -> Optional[str]:
         print(f"Error loading file {file_path}: {e}")
         return None
 
+def _load_file_cached(file_path: str) -> Optional[str]:
+    """
+    Like _load_file, but returns the cached content if the file's
+    modification time and size are unchanged since it was last loaded.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Error loading file {file_path}: {e}")
+        return None
+
+    cached = file_cache.get(file_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        file_cache.move_to_end(file_path)
+        return cached[2]
+
+    content = _load_file(file_path)
+    if content is None:
+        file_cache.pop(file_path, None)
+        return None
+
+    file_cache[file_path] = (stat.st_mtime_ns, stat.st_size, content)
+    file_cache.move_to_end(file_path)
+    while len(file_cache) > FILE_CACHE_MAX_ENTRIES:
+        file_cache.popitem(last=False)
+    return content
+
 def load_corpus(path: str) -> List[Tuple[str, str]]:
     """
     Load documents from the specified path.
+
+    Files are cached by modification time and size, so calling this
+    again on an unchanged corpus does not re-read it from disk.
     
     Args:
         path: Path to the document corpus directory or file
@@ -90,13 +196,13 @@ def load_corpus(path: str) -> List[Tuple[str, str]]:
         for root, _, files in os.walk(path):
             for file in files:
                 file_path = os.path.join(root, file)
-                content = _load_file(file_path)
+                content = _load_file_cached(file_path)
                 if content:
                     documents.append((file_path, content))
                     
     elif os.path.isfile(path):
         print(f"Loading document from file: {path}")
-        content = _load_file(path)
+        content = _load_file_cached(path)
         if content:
             documents.append((path, content))
             
@@ -1,28 +1,41 @@
 import os
-import yaml
+import asyncio
 from typing import Dict, Any, List
 
 # This script requires PyYAML: pip install PyYAML
 try:
     import yaml
+    # Prefer the LibYAML C parser, if PyYAML was built with it
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
 except ImportError:
     print("Warning: 'PyYAML' library not found. Config loading will fail.")
     print("Please install it with: pip install PyYAML")
     yaml = None
+    SafeLoader = None
 
 # Import all components for the new pipeline
 try:
     from .retriever import retrieve_documents
     from .re_ranker import rerank_chunks
-    from .generator import generate_answer
+    from .generator import generate_answer, preload_generator
+    from .semantic_cache import SemanticCache
 except ImportError:
     from retriever import retrieve_documents
     from re_ranker import rerank_chunks
-    from generator import generate_answer
+    from generator import generate_answer, preload_generator
+    from semantic_cache import SemanticCache
 
 # --- Configuration Cache ---
 config_cache: Dict[str, Any] = {}
 
+# --- Answer Cache ---
+# Shared by run_rag and the /run stream, so near-duplicate
+# queries skip the whole pipeline.
+answer_cache = SemanticCache()
+
 def load_config(config_path: str) -> Dict[str, Any]:
     """Loads configuration from a YAML file, with caching."""
     if config_path in config_cache:
@@ -35,8 +48,9 @@ def load_config(config_path: str) -> Dict[str, Any]:
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
         
     try:
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+        # LibYAML reads bytes directly, so no text decoding is needed
+        with open(config_path, 'rb') as f:
+            config = yaml.load(f, Loader=SafeLoader)
             if not config:
                 raise ValueError("Config file is empty or invalid.")
             config_cache[config_path] = config
@@ -45,9 +59,13 @@ def load_config(config_path: str) -> Dict[str, Any]:
         print(f"Error loading config file {config_path}: {e}")
         raise
 
-def run_rag(query: str, config_path: str) -> str:
+async def run_rag(query: str, config_path: str) -> str:
     """
     Execute the complete 2-stage RAG pipeline for a given query.
+
+    The blocking stages run in the default executor. Retrieval and
+    loading the generator model don't depend on each other, so they
+    run concurrently.
     
     Args:
         query: User query to process
@@ -58,7 +76,7 @@ def run_rag(query: str, config_path: str) -> str:
     """
     try:
         # 1. Load configuration
-        config = load_config(config_path)
+        config = await asyncio.to_thread(load_config, config_path)
         
         # Get API key from config OR environment variable
         api_key = os.environ.get("FINEWEB_API_KEY", config.get('fineweb_api_key'))
@@ -73,19 +91,30 @@ def run_rag(query: str, config_path: str) -> str:
         if not generator_model:
             raise ValueError("Config missing 'generator_model'.")
 
-        # 2. Stage 1: Retrieve relevant documents
+        # 2. Return a cached answer for the same (or a near-identical) query
+        query_embedding = await asyncio.to_thread(answer_cache.embed, query)
+        cached = answer_cache.lookup(query_embedding)
+        if cached:
+            return cached["answer"]
+
+        # 3. Stage 1: Retrieve relevant documents, while the generator model loads
         print(f"Stage 1: Retrieving top-{retriever_top_k} documents from FineWeb...")
-        documents_with_urls = retrieve_documents(query, api_key, retriever_top_k)
+        documents_with_urls, _ = await asyncio.gather(
+            asyncio.to_thread(retrieve_documents, query, api_key, retriever_top_k),
+            asyncio.to_thread(preload_generator, generator_model)
+        )
         
         if not documents_with_urls:
             print("No documents found from FineWeb.")
             return "I could not find any relevant information to answer your question."
         
         document_texts = [doc for doc, url in documents_with_urls]
+        citations = [url for doc, url in documents_with_urls]
 
-        # 3. Stage 2: Re-Rank chunks from retrieved documents
+        # 4. Stage 2: Re-Rank chunks from retrieved documents
         print(f"Stage 2: Processing {len(document_texts)} docs and re-ranking for top-{rerank_top_k} chunks...")
-        final_contexts = rerank_chunks(
+        final_contexts = await asyncio.to_thread(
+            rerank_chunks,
             query=query,
             documents=document_texts,
             chunk_size=chunk_size,
@@ -97,11 +126,15 @@ def run_rag(query: str, config_path: str) -> str:
             print("No relevant chunks found after re-ranking.")
             return "I found some documents, but no specific information to answer your question."
 
-        # 4. Generate answer
+        # 5. Generate answer
         print(f"Stage 3: Generating answer using model: {generator_model}...")
-        answer = generate_answer(query, final_contexts, generator_model)
+        answer = await asyncio.to_thread(generate_answer, query, final_contexts, generator_model)
+
+        # Don't cache the error message returned when generation fails
+        if not answer.startswith("Error:"):
+            answer_cache.insert(query_embedding, answer, citations)
         
-        # 5. Return final answer
+        # 6. Return final answer
         return answer
 
     except Exception as e:
@@ -1,40 +1,93 @@
+import logging
+from functools import lru_cache
 from typing import List
 
-# This script requires FAISS and sentence-transformers
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# This script requires sentence-transformers
 try:
-    import faiss
     from sentence_transformers import SentenceTransformer
 except ImportError:
-    print("Warning: 'faiss-cpu' or 'sentence-transformers' not found.")
-    print("Please install them with: pip install faiss-cpu sentence-transformers")
-    faiss = None
+    logger.warning("'sentence-transformers' not found.")
+    logger.warning("Please install it with: pip install sentence-transformers")
     SentenceTransformer = None
 
+# FAISS is optional here: it is only used for very large chunk counts
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
 # Import our project's tokenizer and chunker
 try:
-    from .tokenizer import tokenize, detokenize, TOKENIZER_NAME
-    from .chunker import chunk_tokens
+    from .tokenizer import token_offsets_batch, TOKENIZER_NAME
+    from .chunker import chunk_spans
+    from .device import pick_device
 except ImportError:
-    from tokenizer import tokenize, detokenize, TOKENIZER_NAME
-    from chunker import chunk_tokens
+    from tokenizer import token_offsets_batch, TOKENIZER_NAME
+    from chunker import chunk_spans
+    from device import pick_device
 
 # --- Configuration ---
 # We MUST use the same model from the tokenizer for embedding
 MODEL_NAME = TOKENIZER_NAME
 
-# Initialize the model once
-if SentenceTransformer:
-    try:
-        model = SentenceTransformer(MODEL_NAME)
-        print(f"Successfully loaded embedding model: {MODEL_NAME}")
-    except Exception as e:
-        print(f"Error loading embedding model {MODEL_NAME}: {e}")
-        model = None
-else:
-    model = None
+# Chunks encoded per forward pass. GPUs get larger batches to amortize
+# kernel launches over more work.
+ENCODE_BATCH_SIZE = 64
+GPU_ENCODE_BATCH_SIZE = 256
+
+# Above this many chunks the search goes through a FAISS index. Below it,
+# scoring every chunk with one matrix-vector product is cheaper than
+# building an index that is only searched once.
+FAISS_MIN_CHUNKS = 50_000
+
+# Int8-quantized ONNX export shipped in the model's Hub repository. Its
+# MatMuls map onto AVX-512 VNNI dot-product instructions, which makes CPU
+# encoding ~2-4x faster than PyTorch FP32 with negligible loss in recall.
+ONNX_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
 
 # --- Function ---
 
+def _load_model(**kwargs):
+    """Loads MODEL_NAME from the local HF cache, downloading it only if missing."""
+    try:
+        return SentenceTransformer(MODEL_NAME, local_files_only=True, **kwargs)
+    except Exception:
+        return SentenceTransformer(MODEL_NAME, **kwargs)
+
+@lru_cache(maxsize=1)
+def get_model():
+    """
+    Returns the shared embedding model, loading it on first use.
+
+    Runs on CUDA/MPS with PyTorch when available. On CPU it prefers the
+    quantized ONNX backend (pip install "sentence-transformers[onnx]") and
+    falls back to PyTorch. Returns None if the model cannot be loaded.
+    """
+    if not SentenceTransformer:
+        return None
+
+    # The int8 ONNX model only pays off on CPU; on a GPU, PyTorch is faster
+    device = pick_device()
+    if device == "cpu":
+        try:
+            model = _load_model(backend="onnx", model_kwargs={"file_name": ONNX_MODEL_FILE})
+            logger.info("Successfully loaded embedding model: %s (ONNX int8)", MODEL_NAME)
+            return model
+        except Exception as e:
+            logger.warning("Could not load ONNX model for %s, falling back to PyTorch: %s", MODEL_NAME, e)
+
+    try:
+        model = _load_model(device=device)
+        logger.info("Successfully loaded embedding model: %s (device: %s)", MODEL_NAME, device)
+        return model
+    except Exception as e:
+        logger.error("Error loading embedding model %s: %s", MODEL_NAME, e)
+        return None
+
 def rerank_chunks(query: str, documents: List[str], chunk_size: int, chunk_overlap: int, top_k: int) -> List[str]:
     """
     Takes a query and a list of large documents, processes them into
@@ -50,67 +103,114 @@ def rerank_chunks(query: str, documents: List[str], chunk_size: int, chunk_overl
     Returns:
         A list of the top_k most relevant text chunks.
     """
-    if not model or not faiss:
-        print("Error: re_ranker dependencies (FAISS, SentenceTransformers) not loaded.")
+    model = get_model()
+    if not model:
+        logger.error("re_ranker dependency (SentenceTransformers) not loaded.")
+        return []
+    
+    if top_k <= 0 or not documents:
         return []
     
     # 1. Process all documents into a single list of text chunks
+    # 1a. Tokenize all documents in one batched call, keeping each token's
+    # character span in the original document
+    all_offsets = token_offsets_batch(documents)
+
+    # 1b. Chunk every document by token windows and cut each chunk straight
+    # out of the document text. Nothing has to be detokenized, and chunks
+    # keep the accents and whitespace of the cleaned text.
     all_text_chunks = []
-    for doc in documents:
-        # 1a. Tokenize
-        tokens = tokenize(doc)
-        if not tokens:
-            continue
-        
-        # 1b. Chunk
-        token_chunks = chunk_tokens(tokens, chunk_size, chunk_overlap)
-        
-        # 1c. Detokenize back to text
-        for chunk in token_chunks:
-            all_text_chunks.append(detokenize(chunk))
+    for doc, offsets in zip(documents, all_offsets):
+        for start, end in chunk_spans(len(offsets), chunk_size, chunk_overlap):
+            all_text_chunks.append(doc[offsets[start][0]:offsets[end - 1][1]])
     
     if not all_text_chunks:
-        print("No chunks were generated from the retrieved documents.")
+        logger.warning("No chunks were generated from the retrieved documents.")
         return []
     
-    print(f"Created {len(all_text_chunks)} chunks from {len(documents)} documents.")
-    
-    # 2. Generate embeddings for all chunks
-    try:
-        chunk_embeddings = model.encode(all_text_chunks, show_progress_bar=False)
-        d = chunk_embeddings.shape[1]
-    except Exception as e:
-        print(f"Error encoding chunks: {e}")
-        return []
+    # 1d. Drop duplicate chunks (repeated boilerplate, mirrored pages) so each
+    # distinct text is embedded once. dict.fromkeys keeps first-seen order.
+    n_chunks = len(all_text_chunks)
+    all_text_chunks = list(dict.fromkeys(all_text_chunks))
     
-    # 3. Build a temporary, in-memory FAISS index
-    index = faiss.IndexFlatL2(d)
-    index.add(chunk_embeddings)
+    logger.debug("Created %d chunks (%d unique) from %d documents.", n_chunks, len(all_text_chunks), len(documents))
     
-    # 4. Generate query embedding
+    # 2. Generate embeddings for the query and all chunks of all documents
+    # in one batched call (one tokenizer pass and one set of forward passes).
+    # Normalized embeddings make inner product equal to cosine similarity.
+    # encode() already sorts its inputs by length before batching (and
+    # restores the original order), so each batch is padded only to its own
+    # longest text; sorting here as well would be redundant.
+    # A C-contiguous float32 matrix is what both the matmul and FAISS expect,
+    # so neither makes its own converted copy (this is a no-op if the model
+    # already returned one). Row slices of it stay contiguous.
     try:
-        query_embedding = model.encode([query])
+        embeddings = np.ascontiguousarray(model.encode(
+            [query] + all_text_chunks,
+            batch_size=ENCODE_BATCH_SIZE if pick_device() == "cpu" else GPU_ENCODE_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ), dtype=np.float32)
+        query_embedding = embeddings[:1]
+        chunk_embeddings = embeddings[1:]
+        d = chunk_embeddings.shape[1]
     except Exception as e:
-        print(f"Error encoding query: {e}")
+        logger.error("Error encoding query and chunks: %s", e)
         return []
     
-    # 5. Search the index
-    # D = distances, I = indices (IDs)
+    # 3. Find the top_k chunks by cosine similarity
+    k = min(top_k, len(all_text_chunks))
     try:
-        D, I = index.search(query_embedding, top_k)
-        retrieved_ids = I[0]
+        if faiss and len(all_text_chunks) > FAISS_MIN_CHUNKS:
+            # Temporary, in-memory FAISS index
+            # D = similarities, I = indices (IDs)
+            index = faiss.IndexFlatIP(d)
+            index.add(chunk_embeddings)
+            D, I = index.search(query_embedding, k)
+            retrieved_ids = I[0]
+        else:
+            # One matrix-vector product scores every chunk. argpartition
+            # selects the top k without a full sort; only those k are sorted.
+            # When every chunk is wanted, the partition is skipped entirely.
+            scores = chunk_embeddings @ query_embedding[0]
+            if k < len(scores):
+                retrieved_ids = np.argpartition(-scores, k - 1)[:k]
+                retrieved_ids = retrieved_ids[np.argsort(-scores[retrieved_ids])]
+            else:
+                retrieved_ids = np.argsort(-scores)
     except Exception as e:
-        print(f"Error searching in-memory index: {e}")
+        logger.error("Error searching chunk embeddings: %s", e)
         return []
     
-    # 6. Map IDs back to text chunks
+    # 4. Map IDs back to text chunks
     final_chunks = [all_text_chunks[idx] for idx in retrieved_ids if idx >= 0]
     
     return final_chunks
 
+def warm_up():
+    """
+    Loads the tokenizer and embedding model and runs one dummy encode.
+
+    The first encode pays for kernel selection and allocator warm-up
+    (hundreds of ms); calling this at server start-up keeps that cost
+    off the first real request.
+    """
+    model = get_model()
+    if not model:
+        return
+
+    try:
+        token_offsets_batch(["warmup"])
+        model.encode(["warmup"] * 4, batch_size=4, show_progress_bar=False)
+        logger.info("Embedding model warmed up.")
+    except Exception as e:
+        logger.warning("Embedding model warm-up failed: %s", e)
+
 # --- Example Usage (for testing) ---
 if __name__ == "__main__":
-    if model and faiss:
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+    if get_model():
         test_query = "What is deep learning?"
         
         test_documents = [
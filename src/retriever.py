@@ -1,8 +1,22 @@
 import requests
 import base64
 import json
+import logging
 import os
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# orjson parses JSON several times faster than the standard library:
+# pip install orjson
+try:
+    import orjson
+except ImportError:
+    logger.warning("'orjson' library not found. Falling back to the standard 'json' module.")
+    logger.warning("Please install it with: pip install orjson")
+    orjson = None
 
 # Import the cleaner to process API results
 try:
@@ -13,8 +27,75 @@ except ImportError:
 # --- Configuration ---
 BASE_URL = "https://clueweb22.us/fineweb/search"
 
+# --- HTTP Session ---
+# A single session shared by all requests keeps TCP+TLS connections to the
+# FineWeb API alive, so only the first query pays for the handshake.
+# Failed connects and transient gateway errors are retried with a short
+# backoff (GET is idempotent, so retrying is safe). Read timeouts are not
+# retried: a search that hangs for the full read timeout would only hang
+# again, multiplying the wait.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=100,
+    max_retries=Retry(
+        connect=2,
+        read=False,
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False
+    )
+))
+
+# (connect, read) timeouts: an unreachable API fails after 3 connect
+# attempts (~10s with backoff), while the search itself gets one 15s read
+REQUEST_TIMEOUT = (3.05, 15)
+
 # --- Function ---
 
+def _json_loads(data: bytes):
+    """
+    Parses JSON from bytes, with orjson if available.
+
+    orjson is strict RFC 8259 and rejects input the json module accepts
+    (NaN/Infinity literals, UTF-16/32 encodings), so on an orjson error
+    we retry with the json module before giving up.
+    """
+    if orjson:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+def _decode_one(encoded_doc: str) -> Optional[Tuple[str, str]]:
+    """
+    Decodes and cleans a single base64-encoded document from the API.
+
+    Returns:
+        A (cleaned_content, url) tuple, or None if the document is skipped
+    """
+    try:
+        # Both parsers accept the decoded bytes directly, which avoids
+        # building a second full-size copy of the document as a str
+        document = _json_loads(base64.b64decode(encoded_doc))
+        
+        # Extract content and URL
+        content = document.get("contents", document.get("text"))
+        url = document.get("url", "No URL provided")
+        
+        if content:
+            return clean_text(content), url
+
+        logger.warning("'contents' or 'text' key not found in doc. Skipping.")
+            
+    except (TypeError, base64.binascii.Error, json.JSONDecodeError) as e:
+        logger.warning("Skipping a document due to a decoding/parsing error: %s", e)
+
+    return None
+
 def retrieve_documents(query: str, api_key: str, top_k: int) -> List[Tuple[str, str]]:
     """
     Retrieve relevant documents for a given query using the FineWeb API.
@@ -29,50 +110,41 @@ def retrieve_documents(query: str, api_key: str, top_k: int) -> List[Tuple[str,
     """
     
     if not api_key:
-        print("Error: FineWeb API key is not set.")
+        logger.error("FineWeb API key is not set.")
         return []
 
-    url = f"{BASE_URL}?query={query}&k={top_k}"
+    params = {"query": query, "k": top_k}
     headers = {"x-api-key": api_key}
     retrieved_docs = []
 
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = _SESSION.get(BASE_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
 
         if response.status_code == 200:
-            data = response.json()
+            data = _json_loads(response.content)
             encoded_documents_list = data.get("results")
 
             if encoded_documents_list and isinstance(encoded_documents_list, list):
-                for encoded_doc in encoded_documents_list:
-                    try:
-                        decoded_json_string = base64.b64decode(encoded_doc).decode('utf-8')
-                        document = json.loads(decoded_json_string)
-                        
-                        # Extract content and URL
-                        content = document.get("contents", document.get("text"))
-                        url = document.get("url", "No URL provided")
-                        
-                        if content:
-                            cleaned_content = clean_text(content)
-                            retrieved_docs.append((cleaned_content, url))
-                        else:
-                            print(f"Warning: 'contents' or 'text' key not found in doc. Skipping.")
-                            
-                    except (TypeError, base64.binascii.Error, json.JSONDecodeError) as e:
-                        print(f"Skipping a document due to a decoding/parsing error: {e}")
+                # Decoding and clean_text both hold the GIL, so this runs
+                # serially: a thread pool was measured slower than a plain
+                # loop, and a process pool only pays off for payloads far
+                # larger than a typical top_k returns.
+                retrieved_docs = [doc for doc in map(_decode_one, encoded_documents_list) if doc]
             else:
-                print("API Warning: No results found or the format was not a list.")
+                logger.warning("API returned no results or the format was not a list.")
         else:
-            print(f"API Error: {response.status_code} - {response.text}")
+            logger.error("API Error: %s - %s", response.status_code, response.text)
 
     except requests.exceptions.RequestException as e:
-        print(f"Network Error: Failed to connect to API. {e}")
+        logger.error("Network Error: Failed to connect to API. %s", e)
+    except ValueError as e:
+        logger.error("API Error: Response was not valid JSON. %s", e)
         
     return retrieved_docs
 
 # --- Example Usage (for testing) ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
     TEST_API_KEY = os.environ.get("FINEWEB_API_KEY", "M8eTF0iASb08qLVCL0l2UyR5mFDmFQgj3am8ewVa1Yk")
     test_query = "what is machine learning"
     k = 3
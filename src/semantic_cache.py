@@ -0,0 +1,133 @@
+import logging
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# This script requires FAISS
+try:
+    import faiss
+except ImportError:
+    logger.warning("'faiss-cpu' not found. The semantic answer cache will be disabled.")
+    logger.warning("Please install it with: pip install faiss-cpu")
+    faiss = None
+
+# We embed queries with the same model the re-ranker already has loaded
+try:
+    from .re_ranker import get_model
+except ImportError:
+    from re_ranker import get_model
+
+# --- Configuration ---
+# Minimum cosine similarity between two queries for a cached answer to be
+# reused. 0.85 only matches rephrasings of the same question; lower values
+# start returning answers to related but different questions.
+SIMILARITY_THRESHOLD = 0.85
+# Seconds a cached answer stays valid
+TTL_SECONDS = 300
+# Maximum number of cached answers; the least recently used one is evicted
+MAX_ENTRIES = 1024
+
+# --- Class ---
+
+class SemanticCache:
+    """
+    Caches answers keyed by the embedding of the query that produced them,
+    so near-duplicate queries can skip the retrieve/re-rank/generate pipeline.
+
+    Query embeddings are L2-normalized and stored in a FAISS IndexFlatIP,
+    so the search score is the cosine similarity.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index = None
+        # Row i of the index holds the query embedding of _entries[i]
+        self._entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """
+        Embeds a query for lookup/insert.
+
+        Returns:
+            A (1, d) float32 array, or None if the cache is disabled
+        """
+        model = get_model() if faiss else None
+        if not model:
+            return None
+
+        try:
+            embedding = model.encode([query], normalize_embeddings=True, convert_to_numpy=True)
+            return np.ascontiguousarray(embedding, dtype=np.float32)
+        except Exception as e:
+            logger.warning("Error encoding query for semantic cache: %s", e)
+            return None
+
+    def lookup(self, query_embedding: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """
+        Finds a cached answer for a query embedding.
+
+        Returns:
+            A dict with 'answer' and 'citations', or None on a cache miss
+        """
+        if query_embedding is None:
+            return None
+
+        with self._lock:
+            self._drop_expired()
+            if not self._entries:
+                return None
+
+            D, I = self._index.search(query_embedding, 1)
+            score, idx = float(D[0][0]), int(I[0][0])
+            if idx < 0 or score < self.threshold:
+                return None
+
+            entry = self._entries[idx]
+            entry["last_used"] = time.monotonic()
+            logger.debug("Semantic cache hit (similarity %.3f).", score)
+            return {"answer": entry["answer"], "citations": list(entry["citations"])}
+
+    def insert(self, query_embedding: Optional[np.ndarray], answer: str, citations: List[str]):
+        """Caches an answer under a query embedding."""
+        if query_embedding is None:
+            return
+
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(query_embedding.shape[1])
+
+            if len(self._entries) >= self.max_entries:
+                lru = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+                del self._entries[lru]
+                self._rebuild_index()
+
+            now = time.monotonic()
+            self._entries.append({
+                "embedding": query_embedding[0],
+                "answer": answer,
+                "citations": list(citations),
+                "ts": now,
+                "last_used": now
+            })
+            self._index.add(query_embedding)
+
+    def _drop_expired(self):
+        """Removes entries older than the TTL. Caller must hold the lock."""
+        now = time.monotonic()
+        fresh = [entry for entry in self._entries if now - entry["ts"] < self.ttl]
+        if len(fresh) != len(self._entries):
+            self._entries = fresh
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Re-adds the remaining entries so rows match _entries. Caller must hold the lock."""
+        self._index.reset()
+        if self._entries:
+            self._index.add(np.stack([entry["embedding"] for entry in self._entries]))
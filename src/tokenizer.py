@@ -1,30 +1,47 @@
-from typing import List
+import logging
+from functools import lru_cache
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
 
 # This script requires the 'transformers' and 'sentence-transformers' libraries:
 # pip install transformers sentence-transformers
 try:
     from transformers import AutoTokenizer
 except ImportError:
-    print("Warning: 'transformers' library not found. Tokenization will not work.")
-    print("Please install it with: pip install transformers sentence-transformers")
+    logger.warning("'transformers' library not found. Tokenization will not work.")
+    logger.warning("Please install it with: pip install transformers sentence-transformers")
     AutoTokenizer = None
 
 # --- Configuration ---
 # We use a model popular for sentence embeddings and retrieval tasks.
 TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-# Initialize the tokenizer once when the module is loaded.
-if AutoTokenizer:
+# --- Function ---
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """
+    Returns the shared tokenizer, loading it on first use.
+
+    Code paths that never tokenize skip the load entirely.
+    The local HF cache (HF_HOME) is tried first so an already-downloaded
+    tokenizer loads without revalidating against the Hub.
+    """
+    if not AutoTokenizer:
+        return None
+
     try:
-        tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
-        print(f"Successfully loaded tokenizer: {TOKENIZER_NAME}")
-    except Exception as e:
-        print(f"Error loading tokenizer {TOKENIZER_NAME}: {e}")
-        tokenizer = None
-else:
-    tokenizer = None
+        tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME, local_files_only=True)
+    except Exception:
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+        except Exception as e:
+            logger.error("Error loading tokenizer %s: %s", TOKENIZER_NAME, e)
+            return None
 
-# --- Function ---
+    logger.info("Successfully loaded tokenizer: %s", TOKENIZER_NAME)
+    return tokenizer
 
 def tokenize(text: str) -> List[int]:
     """
@@ -36,39 +53,73 @@ def tokenize(text: str) -> List[int]:
     Returns:
         List of token IDs
     """
+    tokenizer = get_tokenizer()
     if not tokenizer:
-        print("Error: Tokenizer is not loaded. Returning empty list.")
+        logger.error("Tokenizer is not loaded. Returning empty list.")
         return []
         
     if not text:
         return []
 
+    try:
+        # encode() returns the ids directly, skipping the BatchEncoding
+        # object that __call__ builds around them
+        return tokenizer.encode(text, add_special_tokens=False, truncation=False)
+        
+    except Exception as e:
+        logger.error("Error during tokenization: %s", e)
+        return []
+
+def token_offsets_batch(texts: List[str]) -> List[List[Tuple[int, int]]]:
+    """
+    Tokenize many texts in one call and return each token's character span.
+
+    Chunks can then be cut straight out of the original text with these
+    offsets, instead of decoding their token IDs back into a string.
+    
+    Args:
+        texts: Input texts to tokenize
+        
+    Returns:
+        One list of (start, end) character offsets per input text
+    """
+    tokenizer = get_tokenizer()
+    if not tokenizer:
+        logger.error("Tokenizer is not loaded. Returning empty lists.")
+        return [[] for _ in texts]
+
+    if not texts:
+        return []
+
     try:
         encoding = tokenizer(
-            text, 
-            add_special_tokens=False, 
+            texts,
+            add_special_tokens=False,
             truncation=False,
-            return_attention_mask=False
+            return_attention_mask=False,
+            return_offsets_mapping=True
         )
-        return encoding['input_ids']
+        return encoding['offset_mapping']
         
     except Exception as e:
-        print(f"Error during tokenization: {e}")
-        return []
+        logger.error("Error during batch tokenization: %s", e)
+        return [[] for _ in texts]
 
 def detokenize(token_ids: List[int]) -> str:
     """
     Convert a list of token IDs back into a string.
     """
+    tokenizer = get_tokenizer()
     if not tokenizer:
-        print("Error: Tokenizer is not loaded. Cannot detokenize.")
+        logger.error("Tokenizer is not loaded. Cannot detokenize.")
         return ""
     
     return tokenizer.decode(token_ids, skip_special_tokens=True)
 
 # --- Example Usage (for testing) ---
 if __name__ == "__main__":
-    if tokenizer:
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+    if get_tokenizer():
         sample_text = "This is a simple sentence for tokenization."
         print(f"\n--- ORIGINAL TEXT ---")
         print(sample_text)